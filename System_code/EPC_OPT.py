@@ -1,13 +1,69 @@
+import numpy as np
 import pandas as pd
 import os
+import re
+import csv
+from openpyxl import Workbook, load_workbook
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Sequence
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+_HEX_RE = re.compile(r'[0-9A-Fa-f]{24}\Z')
+
+
+def write_excel_rows(columns: Sequence[str], rows: Iterable[Sequence], output_path: str) -> int:
+    # Écriture en flux : chaque ligne part sur disque dès qu'elle est produite, rows peut être un générateur.
+    # xlsxwriter en mode constant_memory (lignes écrites dans l'ordre), sinon openpyxl en mode write_only
+    count = 0
+    if XLSXWRITER_AVAILABLE:
+        workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+        try:
+            worksheet = workbook.add_worksheet('Sheet1')
+            worksheet.write_row(0, 0, [str(col) for col in columns], workbook.add_format({'bold': True}))
+            for count, row in enumerate(rows, 1):
+                worksheet.write_row(count, 0, row)
+        finally:
+            workbook.close()
+    else:
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet('Sheet1')
+        worksheet.append([str(col) for col in columns])
+        for count, row in enumerate(rows, 1):
+            worksheet.append(list(row))
+        workbook.save(output_path)
+    return count
+
+
+def write_rows(columns: Sequence[str], rows: Iterable[Sequence], output_path: str) -> int:
+    # Sortie choisie par l'extension : .csv écrit en texte brut (bien plus rapide), sinon classeur Excel
+    if Path(output_path).suffix.lower() != '.csv':
+        return write_excel_rows(columns, rows, output_path)
+    
+    count = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+    return count
+
+
+def write_excel(df: pd.DataFrame, output_path: str):
+    # Types Python natifs (bool, int) et cellules vides pour les valeurs manquantes, comme df.to_excel
+    cells = df.astype(object).where(df.notna(), None)
+    write_excel_rows(df.columns, cells.itertuples(index=False, name=None), output_path)
 
 
 class EPCAnalyzer:
     def __init__(self):
         self.min_prefix_length = 6
-        self.analysis_results = []
+        self.analysis_results = {}
+        self.groups = []  # EPCs de chaque groupe, dans l'ordre des Group_ID
     
     def load_epcs(self, file_path: str) -> List[str]:
         path = Path(file_path)
@@ -15,23 +71,42 @@ class EPCAnalyzer:
             raise FileNotFoundError(f"File not found: {file_path}")
         
         epcs = []
-        if path.suffix.lower() in ['.txt', '.csv']:
+        # Table d'internement : les lectures répétées d'un même tag partagent un seul objet str
+        interned = {}
+        if path.suffix.lower() == '.txt':
             with open(path, 'r') as f:
                 for line_num, line in enumerate(f, 1):
                     epc = line.strip()
-                    if epc and len(epc) == 24 and all(c in '0123456789ABCDEFabcdef' for c in epc):
-                        epcs.append(epc.upper())
+                    if _HEX_RE.match(epc):
+                        epc = epc.upper()
+                        epcs.append(interned.setdefault(epc, epc))
                     elif epc:
                         print(f"Skipping invalid EPC at line {line_num}: {epc}")
         
+        elif path.suffix.lower() == '.csv':
+            # utf-8-sig : ignore le BOM des exports « CSV UTF-8 » d'Excel ; l'EPC est le premier champ
+            with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+                for line_num, row in enumerate(csv.reader(f), 1):
+                    epc = row[0].strip() if row else ''
+                    if _HEX_RE.match(epc):
+                        epc = epc.upper()
+                        epcs.append(interned.setdefault(epc, epc))
+                    elif epc and line_num > 1:  # Première ligne non hexadécimale : en-tête
+                        print(f"Skipping invalid EPC at line {line_num}: {epc}")
+                        
         elif path.suffix.lower() == '.xlsx':
-            df = pd.read_excel(path, header=None, engine='openpyxl')
-            for idx, epc in enumerate(df.iloc[:, 0], 1):
-                epc = str(epc).strip()
-                if len(epc) == 24 and all(c in '0123456789ABCDEFabcdef' for c in epc):
-                    epcs.append(epc.upper())
-                else:
-                    print(f"Skipping invalid EPC at row {idx}: {epc}")
+            wb = load_workbook(path, read_only=True, data_only=True)
+            try:
+                ws = wb.worksheets[0]
+                for idx, (value,) in enumerate(ws.iter_rows(max_col=1, values_only=True), 1):
+                    epc = '' if value is None else str(value).strip()
+                    if _HEX_RE.match(epc):
+                        epc = epc.upper()
+                        epcs.append(interned.setdefault(epc, epc))
+                    elif epc:
+                        print(f"Skipping invalid EPC at row {idx}: {epc}")
+            finally:
+                wb.close()
         
         else:
             raise ValueError("Unsupported file format. Use .txt, .csv, or .xlsx")
@@ -43,71 +118,64 @@ class EPCAnalyzer:
         return epcs
     
     def group_and_analyze(self, epcs: List[str]) -> pd.DataFrame:
-        groups = []
-        remaining = epcs[:]
+        # Dans le trie compact des EPCs, les sous-arbres maximaux de profondeur >= min_prefix_length
+        # regroupent exactement les EPCs ayant les mêmes min_prefix_length premiers caractères
+        buckets = {}
+        for epc in epcs:
+            buckets.setdefault(epc[:self.min_prefix_length], []).append(epc)
+        groups = list(buckets.values())
+        self.groups = groups
+        prefix_lens = np.zeros(0, dtype=np.int64)
+        
+        if groups:
+            # Matrice (N, 24) des caractères ; lcp[i] = préfixe commun entre les EPCs i et i+1
+            ordered = [epc for group in groups for epc in group]
+            chars = np.frombuffer(''.join(ordered).encode('ascii'), dtype=np.uint8)
+            chars = chars.reshape(len(ordered), -1)
+            width = chars.shape[1]
+            diff = chars[1:] != chars[:-1]
+            lcp = np.where(diff.any(axis=1), diff.argmax(axis=1), width)
+            
+            starts = np.cumsum([0] + [len(group) for group in groups[:-1]])
+            lcp[starts[1:] - 1] = width
+            
+            # Préfixe commun d'un groupe = minimum des préfixes entre voisins
+            prefix_lens = np.minimum.reduceat(np.append(lcp, width), starts)
+        
+        # Construction colonne par colonne : un tableau par champ plutôt qu'un dict par groupe
+        sizes = np.array([len(group) for group in groups], dtype=np.int64)
+        prefix_lens = np.where(sizes > 1, prefix_lens, 0).astype(np.int64)
+        single = sizes == 1
         
-        while remaining:
-            base = remaining.pop(0)
-            group = [base]
-            i = 0
-            while i < len(remaining):
-                common_len = sum(1 for a, b in zip(base, remaining[i]) if a == b)
-                if common_len >= self.min_prefix_length:
-                    group.append(remaining.pop(i))
-                else:
-                    i += 1
-            groups.append(group)
+        prefix_bytes = prefix_lens // 2
+        suffix_bytes = (24 - prefix_lens) // 2
+        overhead = 2 + prefix_bytes
+        total_payload = np.where(single, 14, overhead + sizes * suffix_bytes)
+        safe_suffix = np.maximum(suffix_bytes, 1)
+        epcs_sf7 = np.where(suffix_bytes > 0, np.maximum(0, (51 - overhead) // safe_suffix), 0)
+        epcs_sf12 = np.where(suffix_bytes > 0, np.maximum(0, (11 - overhead) // safe_suffix), 0)
+        uncompressed = sizes * 12
         
-        results = []
-        for gid, group in enumerate(groups, 1):
-            if len(group) == 1:
-                results.append({
-                    'Group_ID': gid,
-                    'Prefix': '',
-                    'Prefix_Bytes': 0,
-                    'Suffix_Bytes': 12,
-                    'Suffix_Count': 1,
-                    'Total_Payload_Bytes': 14,
-                    'EPCs_SF7_51B': 3,
-                    'EPCs_SF12_11B': 0,
-                    'Compression_%': 0
-                })
-            else:
-                prefix_len = min(len(min(group, key=len)), 
-                               max(self.min_prefix_length,
-                                   sum(1 for chars in zip(*group) if len(set(chars)) == 1)))
-                
-                prefix = group[0][:prefix_len]
-                prefix_bytes = prefix_len // 2
-                suffix_bytes = (24 - prefix_len) // 2
-                suffix_count = len(group)
-                
-                total_payload = 2 + prefix_bytes + (suffix_count * suffix_bytes)
-                overhead = 2 + prefix_bytes
-                epcs_sf7 = max(0, (51 - overhead) // suffix_bytes) if suffix_bytes > 0 else 0
-                epcs_sf12 = max(0, (11 - overhead) // suffix_bytes) if suffix_bytes > 0 else 0
-                uncompressed = len(group) * 12
-                compression = round(((uncompressed - total_payload) / uncompressed * 100), 1)
-                
-                results.append({
-                    'Group_ID': gid,
-                    'Prefix': prefix,
-                    'Prefix_Bytes': prefix_bytes,
-                    'Suffix_Bytes': suffix_bytes,
-                    'Suffix_Count': suffix_count,
-                    'Total_Payload_Bytes': total_payload,
-                    'EPCs_SF7_51B': epcs_sf7,
-                    'EPCs_SF12_11B': epcs_sf12,
-                    'Compression_%': compression
-                })
+        results = {
+            'Group_ID': np.arange(1, len(groups) + 1),
+            'Prefix': [group[0][:n] for group, n in zip(groups, prefix_lens.tolist())],
+            'Prefix_Bytes': prefix_bytes,
+            'Suffix_Bytes': suffix_bytes,
+            'Suffix_Count': sizes,
+            'Total_Payload_Bytes': total_payload,
+            'EPCs_SF7_51B': np.where(single, 3, epcs_sf7),
+            'EPCs_SF12_11B': np.where(single, 0, epcs_sf12),
+            'Compression_%': [0 if n == 1 else round((u - t) / u * 100, 1)
+                              for n, u, t in zip(sizes.tolist(), uncompressed.tolist(), total_payload.tolist())]
+        }
         
         self.analysis_results = results
-        return pd.DataFrame(results)
+        return pd.DataFrame(results, copy=False)
     
     def save_results(self, df: pd.DataFrame, output_path: str) -> str:
         """✅ CORRIGÉ : Sauvegarde directe du DataFrame reçu"""
         try:
-            df.to_excel(output_path, index=False, engine='openpyxl')
+            write_excel(df, output_path)
             print(f"✅ Excel file created successfully at: {output_path}")
             return output_path
         except Exception as e:
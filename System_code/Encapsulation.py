@@ -1,16 +1,24 @@
 import random
 import struct
 import math
+import time
+import numpy as np
 import pandas as pd
+from collections import defaultdict, deque
 from typing import List, Dict, Optional, Union, Tuple
-from datetime import datetime
+
+# En-tête LoRaWAN : packet_id (1 octet), nombre d'EPCs (1 octet), timestamp (2 octets)
+_HDR_STRUCT = struct.Struct('>BBH')
+
+# Taille max du payload (octets) selon le SF
+_SF_PAYLOAD_LIMITS = {7: 230, 8: 230, 9: 123, 10: 59, 11: 59, 12: 51}
 
 class EPCLoRaWANCalculator:
     """
     Calculateur LoRaWAN pour encapsuler les EPCs RFID avec calculs de temps d'antenne.
     """
     
-    def __init__(self, sf: int = 12, bw: int = 125, cr: int = 1, payload_size: int = None, epc_input: Union[List[str], Tuple[List[str], pd.DataFrame]] = None):
+    def __init__(self, sf: int = 12, bw: int = 125, cr: int = 1, payload_size: int = None, epc_input: Union[List[str], Tuple[List[str], pd.DataFrame]] = None, verbose: bool = True):
         """
         Initialise le calculateur avec les paramètres LoRaWAN.
         
@@ -20,10 +28,12 @@ class EPCLoRaWANCalculator:
             cr (int): Coding Rate (1-4 pour 4/5, 4/6, 4/7, 4/8)
             payload_size (int): Taille max du payload (calculée auto si None)
             epc_input: Either a list of 24-char hex EPCs or a tuple of (epc_list, optimized_df)
+            verbose (bool): Affiche la configuration et le détail des traitements
         """
         self.sf = sf
         self.bw = bw
         self.cr = cr
+        self.verbose = verbose
         self.epc_size_bytes = 12  # 24 caractères hex = 12 octets
         self.header_size = 4  # 4 octets pour l'en-tête
         
@@ -35,6 +45,20 @@ class EPCLoRaWANCalculator:
             
         self.max_epcs_per_packet = (self.max_payload_size - self.header_size) // self.epc_size_bytes
         
+        # Packer spécialisé pour les trames pleines : en-tête + max_epcs_per_packet EPCs en un seul pack()
+        self._full_epc_bytes = max(self.max_epcs_per_packet, 0) * self.epc_size_bytes
+        self._full_packer = struct.Struct(f'>BBH{self._full_epc_bytes}s')
+        
+        # Constantes de temps d'antenne (ne dépendent que de SF, BW et CR)
+        self._T_sym = (1 << self.sf) / (self.bw * 1000)  # Durée d'un symbole en secondes
+        self._T_pream = (8 + 4.25) * self._T_sym  # Durée du préambule
+        PL_H = 1 if self.sf >= 11 else 0  # Header présent si SF >= 11
+        self._n_payload_const = -4 * self.sf + 28 + 16 - 20 * PL_H
+        self._n_payload_denom = 4 * (self.sf - 2)
+        self._cr_symbols = self.cr + 4
+        self._epc_frame = math.floor((self.max_payload_size - self.header_size) / self.epc_size_bytes)
+        self._airtime_cache = {}  # Paramètres de temps d'antenne déjà calculés, par taille de payload
+        
         # Handle EPC input
         if epc_input is None:
             self.epc_list = []
@@ -44,18 +68,15 @@ class EPCLoRaWANCalculator:
         else:
             self.epc_list = epc_input
         
-        self._validate_epcs()
-        
-        print(f"=== CONFIGURATION LoRaWAN ===")
-        print(f"SF: {self.sf}, BW: {self.bw} kHz, CR: 4/{self.cr + 4}")
-        print(f"Taille max payload: {self.max_payload_size} octets")
-        print(f"EPCs max par trame: {self.max_epcs_per_packet}")
-        print()
+        if self.verbose:
+            print(f"=== CONFIGURATION LoRaWAN ===\n"
+                  f"SF: {self.sf}, BW: {self.bw} kHz, CR: 4/{self.cr + 4}\n"
+                  f"Taille max payload: {self.max_payload_size} octets\n"
+                  f"EPCs max par trame: {self.max_epcs_per_packet}\n")
     
     def _calculate_max_payload_size(self) -> int:
         """Calcule la taille max du payload selon le SF."""
-        sf_limits = {7: 230, 8: 230, 9: 123, 10: 59, 11: 59, 12: 51}
-        return sf_limits.get(self.sf, 51)
+        return _SF_PAYLOAD_LIMITS.get(self.sf, 51)
     
     def _reconstruct_epcs_from_df(self, epc_list: List[str], optimized_df: pd.DataFrame) -> List[str]:
         """
@@ -68,34 +89,89 @@ class EPCLoRaWANCalculator:
         Returns:
             List[str]: List of reconstructed 24-character EPCs
         """
-        reconstructed_epcs = []
-        used_epcs = set()
-        
-        for _, row in optimized_df.iterrows():
-            prefix = row['Prefix']
-            suffix_count = row['Suffix_Count']
-            
-            if not prefix:  # Single EPC group (no compression)
-                matching_epcs = [epc for epc in epc_list if epc not in used_epcs][:suffix_count]
+        prefixes = optimized_df['Prefix'].tolist()
+        suffix_counts = optimized_df['Suffix_Count'].tolist()
+        known_prefixes = {prefix for prefix in prefixes if prefix}
+        prefix_lengths = sorted({len(prefix) for prefix in known_prefixes}, reverse=True)
+        
+        # One pass: each EPC goes to the bucket of its longest known prefix ('' if none)
+        buckets = defaultdict(deque)
+        for epc in epc_list:
+            for length in prefix_lengths:
+                if epc[:length] in known_prefixes:
+                    buckets[epc[:length]].append(epc)
+                    break
             else:
-                matching_epcs = [epc for epc in epc_list if epc.startswith(prefix) and epc not in used_epcs][:suffix_count]
-            
-            if len(matching_epcs) != suffix_count:
-                raise ValueError(f"Could not reconstruct {suffix_count} EPCs for prefix '{prefix}'")
-            
-            reconstructed_epcs.extend(matching_epcs)
-            used_epcs.update(matching_epcs)
+                buckets[''].append(epc)
+        
+        groups = [None] * len(prefixes)
+        for i, (prefix, suffix_count) in enumerate(zip(prefixes, suffix_counts)):
+            if prefix:
+                bucket = buckets[prefix]
+                if len(bucket) < suffix_count:
+                    raise ValueError(f"Could not reconstruct {suffix_count} EPCs for prefix '{prefix}'")
+                groups[i] = [bucket.popleft() for _ in range(suffix_count)]
+        
+        # Single EPC groups (no compression) take the EPCs no prefixed group claimed
+        leftovers = buckets.pop('', deque())
+        for bucket in buckets.values():
+            leftovers.extend(bucket)
+        
+        for i, (prefix, suffix_count) in enumerate(zip(prefixes, suffix_counts)):
+            if not prefix:
+                if len(leftovers) < suffix_count:
+                    raise ValueError(f"Could not reconstruct {suffix_count} EPCs for prefix '{prefix}'")
+                groups[i] = [leftovers.popleft() for _ in range(suffix_count)]
+        
+        reconstructed_epcs = [epc for group in groups for epc in group]
         
         if len(reconstructed_epcs) != len(epc_list):
             raise ValueError(f"Reconstructed EPC count ({len(reconstructed_epcs)}) does not match original ({len(epc_list)})")
         
         return reconstructed_epcs
     
-    def _validate_epcs(self):
-        """Validate that all EPCs are 24-character hexadecimal strings."""
-        for epc in self.epc_list:
-            if len(epc) != 24 or not all(c in '0123456789ABCDEFabcdef' for c in epc):
-                raise ValueError(f"Invalid EPC format: {epc}")
+    @property
+    def epc_list(self) -> Tuple[str, ...]:
+        """
+        EPCs sous forme de chaînes hex majuscules, reconstruits à la demande depuis self._epc_arr.
+        
+        Le tuple retourné est en lecture seule : réaffecter epc_list (setter) est le seul
+        moyen de modifier les EPCs. Les valeurs relues sont normalisées en majuscules.
+        """
+        if self._epc_list is None:
+            self._epc_list = tuple(self._hex_epcs(self.epc_bytes))
+        return self._epc_list
+    
+    @epc_list.setter
+    def epc_list(self, epcs: List[str]):
+        self._epc_list = None
+        self._validate_epcs(epcs)
+    
+    def _hex_epcs(self, block: bytes) -> List[str]:
+        """Découpe un bloc binaire contigu en EPCs hex de 24 caractères."""
+        all_hex = block.hex().upper()
+        width = self.epc_size_bytes * 2
+        return [all_hex[i:i + width] for i in range(0, len(all_hex), width)]
+    
+    def _validate_epcs(self, epcs: List[str]):
+        """
+        Validate that all EPCs are 24-character hexadecimal strings and store
+        them as a contiguous (N, 12) uint8 array in self._epc_arr, with
+        self.epc_bytes being the raw buffer behind it.
+        """
+        try:
+            epc_bytes = bytes.fromhex(''.join(epcs))
+        except ValueError:
+            epc_bytes = b''
+        
+        if (len(epc_bytes) != len(epcs) * self.epc_size_bytes
+                or any(len(epc) != 24 for epc in epcs)):
+            for epc in epcs:
+                if len(epc) != 24 or not all(c in '0123456789ABCDEFabcdef' for c in epc):
+                    raise ValueError(f"Invalid EPC format: {epc}")
+        
+        self.epc_bytes = epc_bytes
+        self._epc_arr = np.frombuffer(epc_bytes, dtype=np.uint8).reshape(-1, self.epc_size_bytes)
     
     def generate_random_epc(self, n: int = 1) -> List[str]:
         """
@@ -107,11 +183,7 @@ class EPCLoRaWANCalculator:
         Returns:
             List[str]: Liste des EPCs
         """
-        epcs = []
-        for _ in range(n):
-            epc = ''.join(random.choices('0123456789ABCDEF', k=24))
-            epcs.append(epc)
-        return epcs
+        return self._hex_epcs(random.randbytes(self.epc_size_bytes * n))
     
     def calculate_airtime_parameters(self, payload_bytes: int) -> Dict:
         """
@@ -121,26 +193,49 @@ class EPCLoRaWANCalculator:
             payload_bytes (int): Taille du payload en octets
             
         Returns:
-            Dict: Paramètres calculés
+            Dict: Paramètres calculés (copie du résultat mis en cache pour cette taille)
         """
-        T_sym = (2**self.sf) / (self.bw * 1000)  # Durée d'un symbole en secondes
-        T_pream = (8 + 4.25) * T_sym  # Durée du préambule
+        params = self._airtime_cache.get(payload_bytes)
+        if params is not None:
+            return dict(params)
         
-        PL_H = 1 if self.sf >= 11 else 0  # Header présent si SF >= 11
-        N_payload = 8 + max(((8 * payload_bytes - 4 * self.sf + 28 + 16 - 20 * PL_H) / (4 * (self.sf - 2))), 0) * (self.cr + 4)
+        T_sym = self._T_sym
+        N_payload = 8 + max((8 * payload_bytes + self._n_payload_const) / self._n_payload_denom, 0) * self._cr_symbols
         
         T_payload = N_payload * T_sym  # Durée payload
-        T_frame = T_pream + T_payload  # Durée totale de la trame
-        
-        EPC_frame = math.floor((self.max_payload_size - self.header_size) / self.epc_size_bytes)
+        T_frame = self._T_pream + T_payload  # Durée totale de la trame
         
-        return {
+        params = self._airtime_cache[payload_bytes] = {
             'T_sym_ms': T_sym * 1000,
-            'T_pream_ms': T_pream * 1000,
+            'T_pream_ms': self._T_pream * 1000,
             'N_payload': N_payload,
             'T_payload_ms': T_payload * 1000,
             'T_frame_ms': T_frame * 1000,
-            'EPC_frame': EPC_frame
+            'EPC_frame': self._epc_frame
+        }
+        return dict(params)
+    
+    def calculate_airtime_batch(self, payload_sizes) -> Dict[str, np.ndarray]:
+        """
+        Version vectorisée de calculate_airtime_parameters pour un balayage de tailles de payload.
+        
+        Args:
+            payload_sizes: Tailles de payload en octets (liste ou tableau NumPy)
+            
+        Returns:
+            Dict: Mêmes clés que calculate_airtime_parameters, valeurs en tableaux NumPy
+        """
+        payload_bytes = np.asarray(payload_sizes, dtype=np.float64)
+        N_payload = 8 + np.maximum((8 * payload_bytes + self._n_payload_const) / self._n_payload_denom, 0) * self._cr_symbols
+        T_payload = N_payload * self._T_sym
+        
+        return {
+            'T_sym_ms': np.full(payload_bytes.shape, self._T_sym * 1000),
+            'T_pream_ms': np.full(payload_bytes.shape, self._T_pream * 1000),
+            'N_payload': N_payload,
+            'T_payload_ms': T_payload * 1000,
+            'T_frame_ms': (self._T_pream + T_payload) * 1000,
+            'EPC_frame': np.full(payload_bytes.shape, self._epc_frame)
         }
     
     def calculate_transmission_plan(self, total_epcs: int) -> Dict:
@@ -155,10 +250,6 @@ class EPCLoRaWANCalculator:
         """
         N_frames = math.ceil(total_epcs / self.max_epcs_per_packet)
         
-        params_700 = self.calculate_airtime_parameters(self.max_payload_size)
-        T_frame_700 = params_700['T_frame_ms']
-        T_batch_700 = math.ceil(700 / self.max_epcs_per_packet) * T_frame_700
-        
         params_current = self.calculate_airtime_parameters(self.max_payload_size)
         T_frame_current = params_current['T_frame_ms']
         T_batch_current = N_frames * T_frame_current
@@ -178,41 +269,48 @@ class EPCLoRaWANCalculator:
             'parameters': params_current
         }
     
-    def create_packet_header(self, packet_id: int, epc_count: int) -> bytes:
-        """Crée l'en-tête du packet LoRaWAN."""
-        timestamp = int(datetime.now().timestamp()) & 0xFFFF
-        return struct.pack('>BBH', packet_id & 0xFF, epc_count & 0xFF, timestamp)
+    def create_packet_header(self, packet_id: int, epc_count: int, timestamp: Optional[int] = None) -> bytes:
+        """Crée l'en-tête du packet LoRaWAN (timestamp 16 bits, lu à l'horloge si absent)."""
+        if timestamp is None:
+            timestamp = int(time.time()) & 0xFFFF
+        return _HDR_STRUCT.pack(packet_id & 0xFF, epc_count & 0xFF, timestamp)
     
-    def create_lorawan_payload(self, epcs: List[str], packet_id: int = 0) -> bytes:
-        """Crée un payload LoRaWAN à partir d'une liste d'EPCs."""
+    def create_lorawan_payload(self, epcs: Union[List[str], List[bytes]], packet_id: int = 0,
+                               timestamp: Optional[int] = None) -> bytes:
+        """Crée un payload LoRaWAN à partir d'une liste d'EPCs (hex ou 12 octets)."""
         if len(epcs) > self.max_epcs_per_packet:
             raise ValueError(f"Trop d'EPCs pour un seul packet. Max: {self.max_epcs_per_packet}")
         
-        header = self.create_packet_header(packet_id, len(epcs))
-        epc_bytes = b''.join(bytes.fromhex(epc) for epc in epcs)
+        if epcs and isinstance(epcs[0], bytes):
+            epc_bytes = b''.join(epcs)
+        else:
+            epc_bytes = bytes.fromhex(''.join(epcs))
         
-        return header + epc_bytes
+        return self._pack_payload(packet_id, len(epcs), epc_bytes, timestamp)
+    
+    def _pack_payload(self, packet_id: int, epc_count: int, epc_bytes: bytes,
+                      timestamp: Optional[int] = None) -> bytes:
+        """Assemble en-tête + EPCs déjà convertis en octets."""
+        if epc_count == self.max_epcs_per_packet and len(epc_bytes) == self._full_epc_bytes:
+            if timestamp is None:
+                timestamp = int(time.time()) & 0xFFFF
+            return self._full_packer.pack(packet_id & 0xFF, epc_count & 0xFF, timestamp, epc_bytes)
+        return self.create_packet_header(packet_id, epc_count, timestamp) + epc_bytes
     
     def decode_payload(self, payload: bytes) -> Dict:
         """Décode un payload LoRaWAN pour extraire les informations."""
         if len(payload) < self.header_size:
             raise ValueError("Payload trop court")
         
-        packet_id, epc_count, timestamp = struct.unpack('>BBH', payload[:4])
+        packet_id, epc_count, timestamp = _HDR_STRUCT.unpack_from(payload, 0)
         
         epc_data = payload[4:]
-        epcs = []
+        size = self.epc_size_bytes
+        if len(epc_data) < epc_count * size:
+            raise ValueError(f"Payload tronqué: {epc_count} EPCs annoncés, {len(epc_data)} octets de données")
         
-        for i in range(epc_count):
-            start_idx = i * self.epc_size_bytes
-            end_idx = start_idx + self.epc_size_bytes
-            
-            if end_idx > len(epc_data):
-                break
-                
-            epc_bytes = epc_data[start_idx:end_idx]
-            epc_hex = epc_bytes.hex().upper()
-            epcs.append(epc_hex)
+        # Une seule conversion hex pour tout le bloc, puis découpage en EPCs de 24 caractères
+        epcs = self._hex_epcs(epc_data[:epc_count * size])
         
         return {
             'packet_id': packet_id,
@@ -231,63 +329,68 @@ class EPCLoRaWANCalculator:
         Returns:
             Dict: Résultats complets
         """
-        if len(self.epc_list) < epc_count:
-            raise ValueError(f"Not enough EPCs provided. Required: {epc_count}, Available: {len(self.epc_list)}")
-        
-        epcs = self.epc_list[:epc_count]
+        available = len(self._epc_arr)
+        if available < epc_count:
+            raise ValueError(f"Not enough EPCs provided. Required: {epc_count}, Available: {available}")
         
-        print(f"EPCs à traiter: {len(epcs)}")
-        for i, epc in enumerate(epcs):
-            print(f"  EPC {i+1}: {epc}")
+        if self.verbose:
+            lines = [f"EPCs à traiter: {epc_count}"]
+            lines.extend(f"  EPC {i+1}: {epc}" for i, epc in enumerate(self.epc_list[:epc_count]))
+            print('\n'.join(lines))
         
         payloads = []
         payload_details = []
-        
-        for i in range(0, len(epcs), self.max_epcs_per_packet):
-            packet_epcs = epcs[i:i + self.max_epcs_per_packet]
-            payload = self.create_lorawan_payload(packet_epcs, i // self.max_epcs_per_packet)
+        lines = []
+        timestamp = int(time.time()) & 0xFFFF  # Un seul horodatage pour tout le lot
+        
+        for i in range(0, epc_count, self.max_epcs_per_packet):
+            packet_id = i // self.max_epcs_per_packet
+            packet_arr = self._epc_arr[i:min(i + self.max_epcs_per_packet, epc_count)]
+            packet_bytes = packet_arr.tobytes()
+            packet_epcs = self._hex_epcs(packet_bytes)
+            payload = self._pack_payload(packet_id, len(packet_arr), packet_bytes, timestamp)
             payloads.append(payload)
             
-            params = self.calculate_airtime_parameters(len(payload))
+            # Taille déterministe : en-tête + 12 octets par EPC, pas besoin de relire le payload
+            payload_size = self.header_size + len(packet_bytes)
+            params = self.calculate_airtime_parameters(payload_size)
             
             payload_details.append({
                 'payload': payload,
                 'epcs': packet_epcs,
                 'params': params
             })
-        
-        print(f"\nPayloads LoRaWAN créés: {len(payloads)}")
-        
-        for i, detail in enumerate(payload_details):
-            payload = detail['payload']
-            packet_epcs = detail['epcs']
-            params = detail['params']
-            
-            print(f"  Payload {i+1}: {payload.hex().upper()} ({len(payload)} octets)")
-            
-            decoded = self.decode_payload(payload)
-            print(f"    Packet ID: {decoded['packet_id']}, EPCs: {decoded['epc_count']}")
-            print(f"    EPCs décodés: {decoded['epcs']}")
             
-            print(f"    CALCULS LoRaWAN:")
-            print(f"      • Durée symbole (T_sym): {params['T_sym_ms']:.2f} ms")
-            print(f"      • Durée préambule (T_pream): {params['T_pream_ms']:.2f} ms")
-            print(f"      • Nombre symboles payload (N_payload): {params['N_payload']:.0f}")
-            print(f"      • Durée payload (T_payload): {params['T_payload_ms']:.2f} ms")
-            print(f"      • Durée totale trame (T_frame): {params['T_frame_ms']:.2f} ms")
-            print(f"      • EPCs max par trame: {params['EPC_frame']}")
-            print()
+            if self.verbose:
+                # Les EPCs du paquet sont déjà connus : pas d'aller-retour par decode_payload
+                lines += [
+                    f"  Payload {packet_id+1}: {payload.hex().upper()} ({payload_size} octets)",
+                    f"    Packet ID: {packet_id & 0xFF}, EPCs: {len(packet_epcs)}",
+                    f"    EPCs décodés: {packet_epcs}",
+                    f"    CALCULS LoRaWAN:",
+                    f"      • Durée symbole (T_sym): {params['T_sym_ms']:.2f} ms",
+                    f"      • Durée préambule (T_pream): {params['T_pream_ms']:.2f} ms",
+                    f"      • Nombre symboles payload (N_payload): {params['N_payload']:.0f}",
+                    f"      • Durée payload (T_payload): {params['T_payload_ms']:.2f} ms",
+                    f"      • Durée totale trame (T_frame): {params['T_frame_ms']:.2f} ms",
+                    f"      • EPCs max par trame: {params['EPC_frame']}",
+                    ""
+                ]
+        
+        if self.verbose:
+            print('\n'.join([f"\nPayloads LoRaWAN créés: {len(payloads)}"] + lines))
         
         plan = self.calculate_transmission_plan(epc_count)
         
-        print(f"=== RÉSUMÉ TRANSMISSION ===")
-        print(f"Total EPCs traités: {epc_count}")
-        print(f"Nombre de trames: {plan['frames_needed']}")
-        print(f"Durée totale du lot: {plan['batch_duration_s']:.2f} s")
-        print(f"Débit max par jour (1% duty): {plan['max_epcs_per_day']:,} EPCs/jour")
+        if self.verbose:
+            print(f"=== RÉSUMÉ TRANSMISSION ===\n"
+                  f"Total EPCs traités: {epc_count}\n"
+                  f"Nombre de trames: {plan['frames_needed']}\n"
+                  f"Durée totale du lot: {plan['batch_duration_s']:.2f} s\n"
+                  f"Débit max par jour (1% duty): {plan['max_epcs_per_day']:,} EPCs/jour")
         
         return {
-            'epcs': epcs,
+            'epcs': self._hex_epcs(self.epc_bytes[:epc_count * self.epc_size_bytes]),
             'payloads': payloads,
             'plan': plan,
             'payload_details': payload_details
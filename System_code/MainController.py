@@ -1,14 +1,117 @@
+import numpy as np
 import pandas as pd
 import logging
-from datetime import datetime
+import logging.handlers
+import os
+import queue
+import atexit
+import time
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
-import traceback
+from typing import List, Dict, Optional, Tuple, Iterator, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 # Import des classes existantes
-from EPC_OPT import EPCAnalyzer
+from EPC_OPT import EPCAnalyzer, write_rows
 from Encapsulation import EPCLoRaWANCalculator
 
+# dtype des EPCs en mémoire : 24 octets ASCII de largeur fixe, un seul tampon contigu pour tous les EPCs
+_EPC_DTYPE = 'S24'
+
+_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Colonnes du fichier de résultats finaux
+_FINAL_COLUMNS = ('Group_ID', 'Prefix', 'Suffix_Count', 'Original_EPCs', 'Payload_Hex', 'Payload_Bytes',
+                  'T_frame_ms', 'T_sym_ms', 'N_payload', 'Decoded_EPCs', 'Verification_OK')
+
+# Calculateur propre à chaque processus de travail (process_groups_to_payloads avec workers > 1)
+_worker_calculator = None
+
+
+def _init_worker(sf: int, bw: int, cr: int):
+    """Initialise le calculateur LoRaWAN d'un processus de travail."""
+    global _worker_calculator
+    _worker_calculator = EPCLoRaWANCalculator(sf=sf, bw=bw, cr=cr, verbose=False)
+
+
+def _encode_group(task: Tuple, calculator: EPCLoRaWANCalculator = None,
+                  verify: bool = False) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Génère le payload LoRaWAN d'un groupe, et le vérifie par décodage si demandé.
+    
+    Args:
+        task (Tuple): (group_id, prefix, suffix_count, group_epcs)
+        calculator (EPCLoRaWANCalculator): Calculateur à utiliser (celui du processus par défaut)
+        verify (bool): Décoder le payload et le comparer aux EPCs d'origine
+        
+    Returns:
+        Tuple: (résultat, None) en cas de succès, (None, message d'erreur) sinon
+    """
+    group_id, prefix, suffix_count, group_epcs = task
+    if calculator is None:
+        calculator = _worker_calculator
+    
+    try:
+        payload = calculator.create_lorawan_payload(group_epcs, group_id - 1)
+        
+        # Calcul des paramètres LoRaWAN
+        params = calculator.calculate_airtime_parameters(len(payload))
+        
+        # Décodage pour vérification (optionnel)
+        decoded_epcs = calculator.decode_payload(payload)['epcs'] if verify else None
+        
+        return {
+            'Group_ID': group_id,
+            'Prefix': prefix,
+            'Suffix_Count': suffix_count,
+            'EPCs': group_epcs,
+            'Payload': payload,  # Octets bruts, prêts pour la transmission
+            'Payload_Hex': payload.hex().upper(),
+            'Payload_Bytes': len(payload),
+            'T_frame_ms': params['T_frame_ms'],
+            'T_sym_ms': params['T_sym_ms'],
+            'N_payload': params['N_payload'],
+            'Decoded_EPCs': decoded_epcs,
+            'Verification_OK': decoded_epcs == group_epcs if verify else None
+        }, None
+    except Exception as e:
+        return None, str(e)
+
+
+def _final_row(result: Dict) -> Tuple:
+    """Convertit un résultat de groupe en ligne du fichier de résultats finaux (colonnes _FINAL_COLUMNS)."""
+    decoded_epcs = result['Decoded_EPCs']
+    return (
+        result['Group_ID'],
+        result['Prefix'],
+        result['Suffix_Count'],
+        '\n'.join(result['EPCs']),
+        result['Payload_Hex'],
+        result['Payload_Bytes'],
+        round(result['T_frame_ms'], 2),
+        round(result['T_sym_ms'], 2),
+        result['N_payload'],
+        None if decoded_epcs is None else '\n'.join(decoded_epcs),
+        result['Verification_OK']
+    )
+
+
+def _verify_payload(task: Tuple, calculator: EPCLoRaWANCalculator = None) -> List[str]:
+    """
+    Décode un payload déjà généré.
+    
+    Args:
+        task (Tuple): (payload, group_epcs)
+        calculator (EPCLoRaWANCalculator): Calculateur à utiliser (celui du processus par défaut)
+        
+    Returns:
+        List[str]: EPCs décodés
+    """
+    payload, group_epcs = task
+    if calculator is None:
+        calculator = _worker_calculator
+    return calculator.decode_payload(payload)['epcs']
+
 
 class MainController:
     """
@@ -19,7 +122,8 @@ class MainController:
     4. Export des résultats finaux
     """
     
-    def __init__(self, sf: int = 12, bw: int = 125, cr: int = 1, log_file: str = "rfid_processing.log"):
+    def __init__(self, sf: int = 12, bw: int = 125, cr: int = 1, log_file: str = "rfid_processing.log",
+                 verify: bool = False, prefer_csv: bool = False):
         """
         Initialise le contrôleur principal.
         
@@ -28,10 +132,16 @@ class MainController:
             bw (int): Bandwidth en kHz (125, 250, 500)
             cr (int): Coding Rate (1-4)
             log_file (str): Nom du fichier de log
+            verify (bool): Décoder chaque payload après génération pour le vérifier.
+                Laisser à False en production ; verify_all() permet une vérification a posteriori.
+            prefer_csv (bool): Lire un export CSV voisin du classeur .xlsx demandé s'il est au moins
+                aussi récent (désactivé par défaut : le classeur reste la source de référence).
         """
         self.sf = sf
         self.bw = bw
         self.cr = cr
+        self.verify = verify
+        self.prefer_csv = prefer_csv
         
         # Configuration des chemins de fichiers
         self.input_file = "EPCS.xlsx"
@@ -47,23 +157,69 @@ class MainController:
         
         # Stockage des résultats
         self.original_epcs = []
+        self.epc_arr = None  # Copie de original_epcs en tableau numpy de largeur fixe, construite à la première utilisation
+        self._epc_src = None  # Liste original_epcs à partir de laquelle epc_arr a été construit
+        self._owner_cache = None  # (original_epcs, préfixes, groupe propriétaire de chaque EPC)
+        self._analyzed_groups = None  # (optimized_df, original_epcs, EPCs de chaque groupe) issus de optimize_epcs
         self.optimized_df = None
         self.final_results = []
+        self.final_totals = None  # [groupes, EPCs, octets, temps de trame ms] de la dernière sauvegarde
         
         self.logger.info(f"MainController initialisé - SF:{sf}, BW:{bw}kHz, CR:4/{cr+4}")
     
     def setup_logging(self, log_file: str):
-        """Configure le système de logging."""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        """
+        Configure le système de logging.
+        
+        Les écritures fichier sont déportées dans le thread d'un QueueListener ;
+        la console reste synchrone pour que les messages s'affichent dans l'ordre des print.
+        """
+        formatter = logging.Formatter(_LOG_FORMAT)
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        stream_handler = logging.StreamHandler()
+        file_handler.setFormatter(formatter)
+        stream_handler.setFormatter(formatter)
+        
+        # Le QueueHandler ne fait que fusionner message et arguments, la mise en forme reste au FileHandler
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        queue_handler.setFormatter(logging.Formatter('%(message)s'))
+        
+        logging.basicConfig(level=logging.INFO, handlers=[queue_handler, stream_handler])
+        
+        if queue_handler in logging.getLogger().handlers:
+            listener = logging.handlers.QueueListener(queue_handler.queue, file_handler)
+            listener.start()
+            atexit.register(listener.stop)
+        else:
+            # Logging déjà configuré (instance précédente) : comportement de basicConfig inchangé
+            file_handler.close()
+        
         self.logger = logging.getLogger(__name__)
     
+    def _resolve_input_path(self, file_path: str) -> str:
+        """
+        Si prefer_csv est activé, préfère un export CSV voisin (même nom, extension .csv)
+        à un classeur .xlsx, s'il est au moins aussi récent : la lecture ligne à ligne évite l'analyse XML.
+        
+        Args:
+            file_path (str): Chemin du fichier demandé
+            
+        Returns:
+            str: Chemin du fichier à lire réellement
+        """
+        path = Path(file_path)
+        if not self.prefer_csv or path.suffix.lower() != '.xlsx':
+            return file_path
+        
+        csv_path = path.with_suffix('.csv')
+        try:
+            if csv_path.stat().st_mtime >= path.stat().st_mtime:
+                self.logger.info(f"Export CSV à jour trouvé, lecture de {csv_path} à la place de {file_path}")
+                return str(csv_path)
+        except OSError:
+            pass
+        return file_path
+    
     def load_input_epcs(self, file_path: str = None) -> List[str]:
         """
         Charge les EPCs depuis le fichier d'entrée.
@@ -78,6 +234,7 @@ class MainController:
             file_path = self.input_file
             
         try:
+            file_path = self._resolve_input_path(file_path)
             self.logger.info(f"Chargement des EPCs depuis {file_path}")
             self.original_epcs = self.epc_analyzer.load_epcs(file_path)
             self.logger.info(f"✅ {len(self.original_epcs)} EPCs chargés avec succès")
@@ -100,6 +257,7 @@ class MainController:
             
             self.logger.info("Début de l'optimisation des EPCs")
             self.optimized_df = self.epc_analyzer.group_and_analyze(self.original_epcs)
+            self._analyzed_groups = (self.optimized_df, self.original_epcs, self.epc_analyzer.groups)
             
             # Sauvegarde des résultats optimisés
             saved_path = self.epc_analyzer.save_results(self.optimized_df, self.optimized_file)
@@ -135,8 +293,13 @@ class MainController:
             
             self.logger.info("Initialisation du calculateur LoRaWAN")
             
-            # Passage des EPCs et du DataFrame optimisé au calculateur
-            epc_input = (self.original_epcs, self.optimized_df)
+            # Passage des EPCs au calculateur dans l'ordre des groupes : ceux de l'analyse s'ils sont
+            # toujours valides, sinon répartis à partir du DataFrame optimisé (comme pour les payloads)
+            groups_epcs = self._known_groups()
+            if groups_epcs is None:
+                groups_epcs = self._bucket_epcs_by_prefix(self.optimized_df['Prefix'].tolist(),
+                                                          self.optimized_df['Suffix_Count'].tolist())
+            epc_input = [epc for group in groups_epcs for epc in group]
             
             self.lorawan_calculator = EPCLoRaWANCalculator(
                 sf=self.sf,
@@ -152,72 +315,184 @@ class MainController:
             self.logger.error(f"❌ Erreur lors de l'initialisation du calculateur: {e}")
             raise
     
-    def process_groups_to_payloads(self) -> List[Dict]:
+    def _prefix_owner(self, prefixes: List[str]) -> np.ndarray:
+        """
+        Calcule, pour chaque EPC, l'index du groupe de plus long préfixe correspondant (-1 si aucun).
+        
+        Le résultat est mis en cache tant que les EPCs et les préfixes ne changent pas,
+        pour les appels successifs de process_groups_to_payloads.
+        
+        Args:
+            prefixes (List[str]): Préfixe de chaque groupe ('' pour un groupe non compressé)
+            
+        Returns:
+            np.ndarray: Index du groupe propriétaire de chaque EPC
+        """
+        # EPCs sous forme de tableau S24, construit à la première utilisation
+        # (et reconstruit si original_epcs a été remplacé ou allongé/raccourci sur place)
+        if (self.epc_arr is None or self._epc_src is not self.original_epcs
+                or len(self.epc_arr) != len(self.original_epcs)):
+            self.epc_arr = np.array(self.original_epcs, dtype=_EPC_DTYPE)
+            self._epc_src = self.original_epcs
+        
+        key = tuple(prefixes)
+        if self._owner_cache is not None:
+            cached_src, cached_key, cached_owner = self._owner_cache
+            if (cached_src is self.original_epcs and cached_key == key
+                    and len(cached_owner) == len(self.original_epcs)):
+                return cached_owner
+        
+        # Préfixes regroupés par longueur, de la plus longue à la plus courte pour retenir
+        # le plus long préfixe correspondant. Pour chaque longueur : troncature S{n} des EPCs
+        # restants puis recherche dichotomique dans les préfixes triés, sans objet Python par EPC
+        by_length = {}
+        for idx, prefix in enumerate(prefixes):
+            if prefix:
+                by_length.setdefault(len(prefix), {}).setdefault(prefix, idx)
+        
+        owner = np.full(len(self.epc_arr), -1, dtype=np.int64)
+        for length in sorted(by_length, reverse=True):
+            pending = np.flatnonzero(owner < 0)
+            if not len(pending):
+                break
+            keys = np.array(list(by_length[length]), dtype=f'S{length}')
+            groups = np.fromiter(by_length[length].values(), dtype=np.int64, count=len(keys))
+            order = np.argsort(keys)
+            keys, groups = keys[order], groups[order]
+            
+            heads = self.epc_arr[pending].astype(f'S{length}')
+            pos = np.minimum(np.searchsorted(keys, heads), len(keys) - 1)
+            hit = keys[pos] == heads
+            owner[pending[hit]] = groups[pos[hit]]
+        
+        self._owner_cache = (self.original_epcs, key, owner)
+        return owner
+    
+    def _known_groups(self) -> Optional[List[List[str]]]:
+        """
+        Retourne les groupes d'EPCs déjà formés par l'analyseur lors de optimize_epcs, si
+        optimized_df et original_epcs n'ont été ni remplacés ni modifiés depuis ; None sinon.
+        
+        L'analyseur regroupe les EPCs par préfixe : ces groupes sont exactement ceux que
+        _bucket_epcs_by_prefix reconstruirait, ce qui évite un nouveau passage sur les EPCs.
+        """
+        if self._analyzed_groups is None:
+            return None
+        analyzed_df, analyzed_epcs, groups_epcs = self._analyzed_groups
+        if analyzed_df is not self.optimized_df or analyzed_epcs is not self.original_epcs:
+            return None
+        
+        # Mêmes objets mais contenu éventuellement modifié sur place (lignes supprimées, EPCs ajoutés)
+        group_sizes = [len(group) for group in groups_epcs]
+        if (len(groups_epcs) != len(self.optimized_df)
+                or self.optimized_df['Suffix_Count'].tolist() != group_sizes
+                or sum(group_sizes) != len(self.original_epcs)):
+            return None
+        return groups_epcs
+    
+    def _bucket_epcs_by_prefix(self, prefixes: List[str], suffix_counts: List[int]) -> List[List[str]]:
+        """
+        Répartit les EPCs originaux entre les groupes en un seul passage.
+        
+        Chaque EPC est rattaché au groupe dont le préfixe est le plus long préfixe
+        correspondant. Les EPCs sans préfixe connu, ou en surplus
+        d'un groupe déjà complet, alimentent dans l'ordre les groupes sans préfixe.
+        
+        Args:
+            prefixes (List[str]): Préfixe de chaque groupe ('' pour un groupe non compressé)
+            suffix_counts (List[int]): Nombre d'EPCs attendus par groupe
+            
+        Returns:
+            List[List[str]]: EPCs de chaque groupe, dans l'ordre des lignes
+        """
+        owner = self._prefix_owner(prefixes)
+        epcs = self.original_epcs
+        
+        # Tri stable par groupe propriétaire : les indices de chaque groupe restent dans l'ordre d'origine.
+        # members[0] = EPCs sans préfixe connu, members[k + 1] = EPCs du groupe k
+        order = np.argsort(owner, kind='stable')
+        counts = np.bincount(owner + 1, minlength=len(prefixes) + 1)
+        members = np.split(order, np.cumsum(counts)[:-1])
+        
+        groups_epcs = [[] for _ in prefixes]
+        unassigned = [members[0]]
+        for idx, prefix in enumerate(prefixes):
+            if prefix:
+                indices = members[idx + 1]
+                groups_epcs[idx] = [epcs[i] for i in indices[:suffix_counts[idx]].tolist()]
+                unassigned.append(indices[suffix_counts[idx]:])
+        
+        # Groupes non compressés : EPCs restants (sans préfixe ou en surplus), dans l'ordre d'origine
+        leftovers = np.sort(np.concatenate(unassigned)).tolist()
+        start = 0
+        for idx, prefix in enumerate(prefixes):
+            if not prefix:
+                take = suffix_counts[idx]
+                groups_epcs[idx] = [epcs[i] for i in leftovers[start:start + take]]
+                start += take
+        
+        return groups_epcs
+    
+    def _iter_group_results(self, workers: int = 1) -> Iterator[Dict]:
+        """
+        Génère les résultats des groupes un par un, au fur et à mesure de leur encodage.
+        
+        Args:
+            workers (int): Nombre de processus d'encodage (1 = séquentiel, None = un par cœur)
+        
+        Yields:
+            Dict: Résultat d'un groupe (les groupes en erreur sont journalisés et ignorés)
+        """
+        if self.lorawan_calculator is None:
+            self.create_lorawan_calculator()
+        
+        group_ids = self.optimized_df['Group_ID'].tolist()
+        prefixes = self.optimized_df['Prefix'].tolist()
+        suffix_counts = self.optimized_df['Suffix_Count'].tolist()
+        
+        # Récupération des EPCs de tous les groupes : ceux de l'analyse si disponibles, sinon en un seul passage
+        groups_epcs = self._known_groups()
+        if groups_epcs is None:
+            groups_epcs = self._bucket_epcs_by_prefix(prefixes, suffix_counts)
+        tasks = list(zip(group_ids, prefixes, suffix_counts, groups_epcs))
+        
+        # Génération des payloads LoRaWAN : groupes indépendants, répartis sur plusieurs processus si demandé
+        if workers == 1 or len(tasks) < 2:
+            outcomes = (_encode_group(task, self.lorawan_calculator, self.verify) for task in tasks)
+        else:
+            outcomes = self._imap_in_pool(partial(_encode_group, verify=self.verify), tasks, workers)
+        
+        # Formatage différé (%-style) et test du niveau une seule fois pour la boucle
+        log_groups = self.logger.isEnabledFor(logging.INFO)
+        for (group_id, prefix, suffix_count, group_epcs), (result, error) in zip(tasks, outcomes):
+            if len(group_epcs) != suffix_count:
+                self.logger.warning("⚠️ Groupe %d: %d EPCs trouvés au lieu de %d", group_id, len(group_epcs), suffix_count)
+            
+            if error is not None:
+                self.logger.error("❌ Erreur groupe %d: %s", group_id, error)
+                continue
+            
+            if log_groups:
+                self.logger.info("✅ Groupe %d: Payload généré (%d octets, %.2fms)",
+                                 group_id, result['Payload_Bytes'], result['T_frame_ms'])
+            
+            yield result
+    
+    def process_groups_to_payloads(self, workers: int = 1) -> List[Dict]:
         """
         Traite chaque groupe optimisé pour générer les payloads LoRaWAN.
         
+        Args:
+            workers (int): Nombre de processus d'encodage (1 = séquentiel, None = un par cœur)
+            
         Returns:
             List[Dict]: Liste des résultats finaux
         """
         try:
-            if self.lorawan_calculator is None:
-                self.create_lorawan_calculator()
-            
             self.logger.info("Génération des payloads LoRaWAN")
             self.final_results = []
-            
-            for idx, row in self.optimized_df.iterrows():
-                group_id = row['Group_ID']
-                prefix = row['Prefix']
-                suffix_count = row['Suffix_Count']
-                
-                # Récupération des EPCs du groupe
-                if not prefix:  # Groupe non compressé
-                    # Prendre les EPCs restants (logique simplifiée)
-                    group_epcs = [epc for epc in self.original_epcs 
-                                if not any(epc.startswith(other_row['Prefix']) 
-                                         for _, other_row in self.optimized_df.iterrows() 
-                                         if other_row['Prefix'] and other_row.name != idx)][:suffix_count]
-                else:
-                    # EPCs avec ce préfixe
-                    group_epcs = [epc for epc in self.original_epcs 
-                                if epc.startswith(prefix)][:suffix_count]
-                
-                if len(group_epcs) != suffix_count:
-                    self.logger.warning(f"⚠️ Groupe {group_id}: {len(group_epcs)} EPCs trouvés au lieu de {suffix_count}")
-                
-                # Génération du payload LoRaWAN pour ce groupe
-                try:
-                    payload = self.lorawan_calculator.create_lorawan_payload(group_epcs, group_id - 1)
-                    payload_hex = payload.hex().upper()
-                    
-                    # Calcul des paramètres LoRaWAN
-                    params = self.lorawan_calculator.calculate_airtime_parameters(len(payload))
-                    
-                    # Décodage pour vérification
-                    decoded = self.lorawan_calculator.decode_payload(payload)
-                    
-                    result = {
-                        'Group_ID': group_id,
-                        'Prefix': prefix,
-                        'Suffix_Count': suffix_count,
-                        'EPCs': group_epcs,
-                        'Payload_Hex': payload_hex,
-                        'Payload_Bytes': len(payload),
-                        'T_frame_ms': params['T_frame_ms'],
-                        'T_sym_ms': params['T_sym_ms'],
-                        'N_payload': params['N_payload'],
-                        'Decoded_EPCs': decoded['epcs'],
-                        'Verification_OK': decoded['epcs'] == group_epcs
-                    }
-                    
-                    self.final_results.append(result)
-                    
-                    self.logger.info(f"✅ Groupe {group_id}: Payload généré ({len(payload)} octets, {params['T_frame_ms']:.2f}ms)")
-                    
-                except Exception as e:
-                    self.logger.error(f"❌ Erreur groupe {group_id}: {e}")
-                    continue
+            self.final_totals = None
+            self.final_results.extend(self._iter_group_results(workers))
             
             self.logger.info(f"🎯 {len(self.final_results)} payloads générés avec succès")
             return self.final_results
@@ -226,12 +501,64 @@ class MainController:
             self.logger.error(f"❌ Erreur lors de la génération des payloads: {e}")
             raise
     
+    def _imap_in_pool(self, func, tasks: List[Tuple], workers: Optional[int]) -> Iterator:
+        """
+        Applique func à chaque tâche dans un pool de processus disposant chacun d'un calculateur.
+        
+        Args:
+            func: Fonction de niveau module (sérialisable) appliquée à chaque tâche
+            tasks (List[Tuple]): Tâches à traiter
+            workers (int): Nombre de processus (None = un par cœur)
+        
+        Yields:
+            Résultats dans l'ordre des tâches, dès qu'ils sont disponibles
+        """
+        max_workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(tasks) // (4 * max_workers))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(self.sf, self.bw, self.cr)) as executor:
+            yield from executor.map(func, tasks, chunksize=chunksize)
+    
+    def verify_all(self, workers: int = 1) -> int:
+        """
+        Vérifie a posteriori tous les payloads générés en les décodant.
+        
+        Renseigne Decoded_EPCs et Verification_OK de chaque résultat.
+        
+        Args:
+            workers (int): Nombre de processus de décodage (1 = séquentiel, None = un par cœur)
+            
+        Returns:
+            int: Nombre de payloads dont le décodage ne correspond pas aux EPCs d'origine
+        """
+        if not self.final_results:
+            raise ValueError("Aucun résultat à vérifier. Utilisez process_groups_to_payloads() d'abord.")
+        if self.lorawan_calculator is None:
+            self.create_lorawan_calculator()
+        
+        tasks = [(result['Payload'], result['EPCs']) for result in self.final_results]
+        if workers == 1 or len(tasks) < 2:
+            decoded = [_verify_payload(task, self.lorawan_calculator) for task in tasks]
+        else:
+            decoded = list(self._imap_in_pool(_verify_payload, tasks, workers))
+        
+        failures = 0
+        for result, decoded_epcs in zip(self.final_results, decoded):
+            result['Decoded_EPCs'] = decoded_epcs
+            result['Verification_OK'] = decoded_epcs == result['EPCs']
+            if not result['Verification_OK']:
+                failures += 1
+                self.logger.warning("⚠️ Groupe %d: payload décodé différent des EPCs d'origine", result['Group_ID'])
+        
+        self.logger.info("🔍 Vérification: %d/%d payloads conformes", len(tasks) - failures, len(tasks))
+        return failures
+    
     def save_final_results(self, output_file: str = None) -> str:
         """
-        Sauvegarde les résultats finaux dans un fichier Excel.
+        Sauvegarde les résultats finaux dans un fichier Excel (ou CSV).
         
         Args:
-            output_file (str): Chemin du fichier de sortie
+            output_file (str): Chemin du fichier de sortie (extension .csv pour un export CSV, plus rapide)
             
         Returns:
             str: Chemin du fichier sauvegardé
@@ -243,45 +570,55 @@ class MainController:
             if not self.final_results:
                 raise ValueError("Aucun résultat à sauvegarder. Utilisez process_groups_to_payloads() d'abord.")
             
-            # Préparation des données pour Excel
-            excel_data = []
-            
-            for result in self.final_results:
-                # Formatage des EPCs pour l'affichage
-                epcs_display = '\n'.join(result['EPCs'])
-                decoded_epcs_display = '\n'.join(result['Decoded_EPCs'])
-                
-                excel_data.append({
-                    'Group_ID': result['Group_ID'],
-                    'Prefix': result['Prefix'],
-                    'Suffix_Count': result['Suffix_Count'],
-                    'Original_EPCs': epcs_display,
-                    'Payload_Hex': result['Payload_Hex'],
-                    'Payload_Bytes': result['Payload_Bytes'],
-                    'T_frame_ms': round(result['T_frame_ms'], 2),
-                    'T_sym_ms': round(result['T_sym_ms'], 2),
-                    'N_payload': result['N_payload'],
-                    'Decoded_EPCs': decoded_epcs_display,
-                    'Verification_OK': result['Verification_OK']
-                })
-            
-            df_final = pd.DataFrame(excel_data)
-            
-            # Sauvegarde Excel
-            df_final.to_excel(output_file, index=False, engine='openpyxl')
+            # Sauvegarde ligne par ligne (Excel via xlsxwriter en flux si disponible, ou CSV si output_file
+            # se termine par .csv), sans copie intermédiaire ;
+            # les statistiques finales sont cumulées pendant ce même passage
+            totals = [0, 0, 0, 0.0]
+            write_rows(_FINAL_COLUMNS, self._final_rows(self.final_results, totals), output_file)
+            self.final_totals = totals
             
             self.logger.info(f"✅ Résultats finaux sauvegardés dans {output_file}")
             
-            # Statistiques finales
-            total_epcs = sum(result['Suffix_Count'] for result in self.final_results)
-            total_payload_bytes = sum(result['Payload_Bytes'] for result in self.final_results)
-            avg_frame_time = sum(result['T_frame_ms'] for result in self.final_results) / len(self.final_results)
+            self._log_final_stats(*totals)
+            
+            return output_file
+            
+        except Exception as e:
+            self.logger.error(f"❌ Erreur lors de la sauvegarde: {e}")
+            raise
+    
+    def stream_final_results(self, output_file: str = None, workers: int = 1) -> str:
+        """
+        Génère les payloads et écrit chaque groupe dans le fichier de sortie dès qu'il est produit,
+        sans conserver les résultats en mémoire : self.final_results est vidé, seuls les
+        cumuls sont gardés dans self.final_totals.
+        
+        Args:
+            output_file (str): Chemin du fichier de sortie
+            workers (int): Nombre de processus d'encodage (1 = séquentiel, None = un par cœur)
+            
+        Returns:
+            str: Chemin du fichier sauvegardé
+        """
+        try:
+            if output_file is None:
+                output_file = self.final_output_file
+            
+            self.logger.info("Génération des payloads LoRaWAN (écriture en flux)")
+            
+            # Les résultats d'un traitement précédent ne correspondent plus au fichier écrit
+            self.final_results = []
+            self.final_totals = None
             
-            self.logger.info(f"📈 Statistiques finales:")
-            self.logger.info(f"   • Total EPCs traités: {total_epcs}")
-            self.logger.info(f"   • Total payload bytes: {total_payload_bytes}")
-            self.logger.info(f"   • Temps de trame moyen: {avg_frame_time:.2f}ms")
-            self.logger.info(f"   • Groupes générés: {len(self.final_results)}")
+            totals = [0, 0, 0, 0.0]
+            write_rows(_FINAL_COLUMNS, self._final_rows(self._iter_group_results(workers), totals), output_file)
+            self.final_totals = totals
+            
+            self.logger.info(f"✅ Résultats finaux sauvegardés dans {output_file}")
+            if totals[0]:
+                self._log_final_stats(*totals)
+            else:
+                self.logger.warning("⚠️ Aucun payload généré")
             
             return output_file
             
@@ -289,6 +626,32 @@ class MainController:
             self.logger.error(f"❌ Erreur lors de la sauvegarde: {e}")
             raise
     
+    def _final_rows(self, results: Iterable[Dict], totals: List) -> Iterator[Tuple]:
+        """
+        Convertit les résultats en lignes du fichier final en un seul passage.
+        
+        Args:
+            results (Iterable[Dict]): Résultats des groupes (liste ou générateur)
+            totals (List): Cumuls mis à jour au fil de l'eau : [groupes, EPCs, octets, temps de trame ms]
+        
+        Yields:
+            Tuple: Ligne correspondant à _FINAL_COLUMNS
+        """
+        for result in results:
+            totals[0] += 1
+            totals[1] += result['Suffix_Count']
+            totals[2] += result['Payload_Bytes']
+            totals[3] += result['T_frame_ms']
+            yield _final_row(result)
+    
+    def _log_final_stats(self, group_count: int, total_epcs: int, total_payload_bytes: int, total_frame_time: float):
+        """Journalise les statistiques finales d'un lot de résultats."""
+        self.logger.info(f"📈 Statistiques finales:")
+        self.logger.info(f"   • Total EPCs traités: {total_epcs}")
+        self.logger.info(f"   • Total payload bytes: {total_payload_bytes}")
+        self.logger.info(f"   • Temps de trame moyen: {total_frame_time / group_count:.2f}ms")
+        self.logger.info(f"   • Groupes générés: {group_count}")
+    
     def run_complete_process(self, input_file: str = None) -> str:
         """
         Exécute le processus complet de traitement des EPCs.
@@ -300,7 +663,7 @@ class MainController:
             str: Chemin du fichier de résultats finaux
         """
         try:
-            start_time = datetime.now()
+            start_time = time.perf_counter()
             self.logger.info("🚀 DÉBUT DU PROCESSUS COMPLET")
             
             # Étape 1: Chargement des EPCs
@@ -319,8 +682,7 @@ class MainController:
             output_file = self.save_final_results()
             
             # Temps de traitement
-            end_time = datetime.now()
-            processing_time = (end_time - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             
             self.logger.info(f"🎉 PROCESSUS TERMINÉ avec succès en {processing_time:.2f}s")
             self.logger.info(f"📁 Fichiers générés:")
@@ -331,6 +693,7 @@ class MainController:
             
         except Exception as e:
             self.logger.error(f"💥 ÉCHEC DU PROCESSUS: {e}")
+            import traceback  # Uniquement nécessaire en cas d'échec
             self.logger.error(f"Détails de l'erreur:\n{traceback.format_exc()}")
             raise
 
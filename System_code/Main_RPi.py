@@ -10,9 +10,10 @@ import sys
 import time
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
 import signal
 import threading
+import abc
+from functools import lru_cache
 
 # Import de la classe principale
 try:
@@ -44,27 +45,120 @@ class SX1262Config:
     # Configuration SPI
     SPI_BUS = 0      # SPI bus number
     SPI_DEVICE = 0   # SPI device number
-    SPI_SPEED = 1000000  # 1MHz
+    SPI_SPEED = 8000000  # 8MHz (le SX1262 accepte jusqu'à 16MHz ; marge pour un câblage non optimisé)
     
     # Configuration LoRa
     FREQUENCY = 868100000  # 868.1 MHz (EU868)
     OUTPUT_POWER = 14      # dBm
     PREAMBLE_LENGTH = 8    # symbols
+    
+    # Plus longue commande SPI : WriteBuffer = opcode + offset + 256 octets de buffer radio
+    SPI_MAX_COMMAND_LENGTH = 258
+    
+    # IRQ routées sur DIO1 : TxDone (bit 0) et Timeout (bit 9)
+    IRQ_TX_DONE_TIMEOUT = 0x0201
+    
+    # Séquence d'initialisation (opcode, paramètres) précalculée à l'import ;
+    # seule SetModulationParams (SF, BW, CR) dépend de la configuration et s'insère entre les deux
+    INIT_COMMANDS_BEFORE_MODULATION = (
+        (0x80, b'\x00'),  # SetStandby
+        (0x8A, b'\x01'),  # SetPacketType (LoRa)
+    )
+    INIT_COMMANDS_AFTER_MODULATION = (
+        (0x8C, bytes([8, 0, 12, 1, 0, 0])),  # SetPacketParams
+        (0x86, FREQUENCY.to_bytes(4, 'big')),  # SetRfFrequency
+        (0x8E, bytes([OUTPUT_POWER, 0x04])),  # SetTxParams
+        (0x08, IRQ_TX_DONE_TIMEOUT.to_bytes(2, 'big') * 2 + bytes(4)),  # SetDioIrqParams (fin d'émission sur DIO1)
+    )
 
 
-class SX1262Controller:
-    """Contrôleur pour le transceiver SX1262."""
+class _SX1262Base(abc.ABC):
+    """
+    Contrôleur pour le transceiver SX1262 (partie commune).
+    
+    Les opérations matérielles sont fournies par SX1262Hardware ou SX1262Simulation,
+    choisie une fois pour toutes par SX1262Controller() selon SPI_AVAILABLE.
+    """
     
     def __init__(self):
         self.config = SX1262Config()
         self.spi = None
         self.initialized = False
+    
+    @abc.abstractmethod
+    def reset_sx1262(self):
+        """Reset du SX1262."""
+    
+    @abc.abstractmethod
+    def wait_while_busy(self, timeout: float = 0.1):
+        """Attend que BUSY repasse à LOW (SX1262 prêt à recevoir une commande)."""
+    
+    @abc.abstractmethod
+    def send_command(self, command: int, params=None) -> list:
+        """Envoie une commande au SX1262."""
+    
+    @abc.abstractmethod
+    def _transmit(self, payload: bytes, timeout: float) -> bool:
+        """Émet un payload sur un SX1262 déjà initialisé."""
+    
+    @abc.abstractmethod
+    def cleanup(self):
+        """Nettoyage des ressources."""
+    
+    def initialize_lora(self, sf: int, bw: int, cr: int):
+        """Initialise le SX1262 en mode LoRa."""
+        try:
+            print("🔧 Initialisation SX1262...")
+            
+            # Reset du module
+            self.reset_sx1262()
+            
+            # Commandes d'initialisation (simplifiées)
+            commands = (self.config.INIT_COMMANDS_BEFORE_MODULATION
+                        + ((0x8B, bytes([sf, bw, cr, 0])),)  # SetModulationParams
+                        + self.config.INIT_COMMANDS_AFTER_MODULATION)
+            
+            # Chaque commande attend BUSY avant de partir : pas de pause fixe entre les commandes
+            for cmd, params in commands:
+                self.send_command(cmd, params)
+            self.wait_while_busy()
+            
+            self.initialized = True
+            print("✅ SX1262 initialisé")
+            
+        except Exception as e:
+            print(f"❌ Erreur initialisation SX1262: {e}")
+            raise
+    
+    def transmit_payload(self, payload: bytes, timeout: float = 5.0) -> bool:
+        """
+        Transmet un payload via LoRaWAN.
         
-        if SPI_AVAILABLE:
-            self.setup_gpio()
-            self.setup_spi()
-        else:
-            print("⚠️ Mode simulation - pas de communication SPI réelle")
+        La fin d'émission est attendue sur le front montant de DIO1 (IRQ TxDone),
+        au plus timeout secondes, plutôt qu'avec une pause fixe.
+        """
+        if not self.initialized:
+            print("⚠️ SX1262 non initialisé")
+            return False
+        
+        try:
+            return self._transmit(payload, timeout)
+            
+        except Exception as e:
+            print(f"❌ Erreur transmission: {e}")
+            return False
+
+
+class SX1262Hardware(_SX1262Base):
+    """SX1262 réel piloté par SPI et GPIO."""
+    
+    def __init__(self):
+        super().__init__()
+        # Tampon d'émission SPI réutilisé par toutes les commandes
+        self._tx_buf = bytearray(self.config.SPI_MAX_COMMAND_LENGTH)
+        self._tx_view = memoryview(self._tx_buf)
+        self.setup_gpio()
+        self.setup_spi()
     
     def setup_gpio(self):
         """Configure les pins GPIO."""
@@ -95,6 +189,8 @@ class SX1262Controller:
             self.spi.open(self.config.SPI_BUS, self.config.SPI_DEVICE)
             self.spi.max_speed_hz = self.config.SPI_SPEED
             self.spi.mode = 0
+            # xfer3 (spidev >= 3.5) accepte des tampons plus grands que xfer2 en un seul appel
+            self._xfer = getattr(self.spi, 'xfer3', self.spi.xfer2)
             
             print("✅ SPI configuré")
             
@@ -104,25 +200,13 @@ class SX1262Controller:
     
     def reset_sx1262(self):
         """Reset du SX1262."""
-        if not SPI_AVAILABLE:
-            print("🔄 [SIMULATION] Reset SX1262")
-            time.sleep(0.1)
-            return
-        
         try:
             GPIO.output(self.config.RESET_PIN, GPIO.LOW)
             time.sleep(0.001)  # 1ms
             GPIO.output(self.config.RESET_PIN, GPIO.HIGH)
             time.sleep(0.01)   # 10ms
             
-            # Attendre que BUSY soit à LOW
-            timeout = 100
-            while GPIO.input(self.config.BUSY_PIN) and timeout > 0:
-                time.sleep(0.001)
-                timeout -= 1
-            
-            if timeout == 0:
-                raise TimeoutError("SX1262 reste occupé après reset")
+            self.wait_while_busy()
             
             print("✅ SX1262 reset effectué")
             
@@ -130,25 +214,35 @@ class SX1262Controller:
             print(f"❌ Erreur reset SX1262: {e}")
             raise
     
-    def send_command(self, command: int, params: list = None) -> list:
-        """Envoie une commande au SX1262."""
-        if not SPI_AVAILABLE:
-            print(f"📡 [SIMULATION] Commande SX1262: 0x{command:02X}")
-            return [0x00] * (len(params) if params else 1)
+    def wait_while_busy(self, timeout: float = 0.1):
+        """Attend que BUSY repasse à LOW (SX1262 prêt à recevoir une commande)."""
+        deadline = time.monotonic() + timeout
+        while GPIO.input(self.config.BUSY_PIN):
+            if time.monotonic() > deadline:
+                raise TimeoutError("SX1262 reste occupé")
+            time.sleep(0.001)
+    
+    def send_command(self, command: int, params=None) -> list:
+        """
+        Envoie une commande au SX1262 en une seule transaction SPI.
         
+        Le SX1262 exécute une commande à la remontée de NSS : chaque commande a donc sa
+        propre fenêtre CS, mais opcode et paramètres partent dans un seul transfert.
+        params peut être une liste d'entiers ou directement des bytes (payload).
+        """
         try:
-            # Attendre que BUSY soit à LOW
-            while GPIO.input(self.config.BUSY_PIN):
-                time.sleep(0.001)
+            self.wait_while_busy()
             
-            # Préparation des données
-            data = [command]
+            # Opcode + paramètres copiés dans le tampon préalloué, sans nouvelle allocation
+            length = 1
+            self._tx_buf[0] = command
             if params:
-                data.extend(params)
+                length += len(params)
+                self._tx_buf[1:length] = params
             
             # Transmission SPI
             GPIO.output(self.config.NSS_PIN, GPIO.LOW)
-            response = self.spi.xfer2(data)
+            response = self._xfer(self._tx_view[:length])
             GPIO.output(self.config.NSS_PIN, GPIO.HIGH)
             
             return response
@@ -157,69 +251,27 @@ class SX1262Controller:
             print(f"❌ Erreur commande SX1262: {e}")
             raise
     
-    def initialize_lora(self, sf: int, bw: int, cr: int):
-        """Initialise le SX1262 en mode LoRa."""
-        try:
-            print("🔧 Initialisation SX1262...")
-            
-            # Reset du module
-            self.reset_sx1262()
-            
-            # Commandes d'initialisation (simplifiées)
-            commands = [
-                (0x80, [0x00]),  # SetStandby
-                (0x8A, [0x01]),  # SetPacketType (LoRa)
-                (0x8B, [sf, bw, cr, 0]),  # SetModulationParams
-                (0x8C, [8, 0, 12, 1, 0, 0]),  # SetPacketParams
-                (0x86, [self.config.FREQUENCY >> 24, 
-                       (self.config.FREQUENCY >> 16) & 0xFF,
-                       (self.config.FREQUENCY >> 8) & 0xFF,
-                       self.config.FREQUENCY & 0xFF]),  # SetRfFrequency
-                (0x8E, [self.config.OUTPUT_POWER, 0x04]),  # SetTxParams
-            ]
-            
-            for cmd, params in commands:
-                self.send_command(cmd, params)
-                time.sleep(0.01)
-            
-            self.initialized = True
-            print("✅ SX1262 initialisé")
-            
-        except Exception as e:
-            print(f"❌ Erreur initialisation SX1262: {e}")
-            raise
-    
-    def transmit_payload(self, payload: bytes) -> bool:
-        """Transmet un payload via LoRaWAN."""
-        if not self.initialized:
-            print("⚠️ SX1262 non initialisé")
-            return False
+    def _transmit(self, payload: bytes, timeout: float) -> bool:
+        """Écrit le payload, lance l'émission et attend l'IRQ TxDone sur DIO1."""
+        # Écriture du payload dans le buffer : offset 0 puis données, dans une seule commande WriteBuffer
+        self.send_command(0x0E, b'\x00' + payload)
         
-        try:
-            if not SPI_AVAILABLE:
-                print(f"📡 [SIMULATION] Transmission: {payload.hex().upper()} ({len(payload)} octets)")
-                time.sleep(0.5)  # Simule le temps de transmission
-                return True
-            
-            # Écriture du payload dans le buffer
-            self.send_command(0x0E, [0x00])  # WriteBuffer
-            self.send_command(0x0E, list(payload))
-            
-            # Configuration du packet
-            self.send_command(0x8C, [self.config.PREAMBLE_LENGTH, 0, len(payload), 1, 0, 0])
-            
-            # Transmission
-            self.send_command(0x83, [0x40, 0x00, 0x00])  # SetTx
-            
-            # Attente de fin de transmission (simplifiée)
-            time.sleep(1.0)  # Timeout approximatif basé sur le SF
-            
-            print(f"📡 Payload transmis: {payload.hex().upper()} ({len(payload)} octets)")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Erreur transmission: {e}")
+        # Configuration du packet
+        self.send_command(0x8C, [self.config.PREAMBLE_LENGTH, 0, len(payload), 1, 0, 0])
+        
+        # Transmission
+        self.send_command(0x02, [0xFF, 0xFF])  # ClearIrqStatus
+        self.send_command(0x83, [0x40, 0x00, 0x00])  # SetTx
+        
+        # Attente de fin de transmission : le thread dort jusqu'à l'interruption DIO1
+        edge = GPIO.wait_for_edge(self.config.DIO1_PIN, GPIO.RISING, timeout=int(timeout * 1000))
+        self.send_command(0x02, [0xFF, 0xFF])  # ClearIrqStatus
+        if edge is None:
+            print(f"⚠️ Pas d'IRQ TxDone après {timeout:.1f}s")
             return False
+        
+        print(f"📡 Payload transmis: {payload.hex().upper()} ({len(payload)} octets)")
+        return True
     
     def cleanup(self):
         """Nettoyage des ressources."""
@@ -227,8 +279,7 @@ class SX1262Controller:
             if self.spi:
                 self.spi.close()
             
-            if SPI_AVAILABLE:
-                GPIO.cleanup()
+            GPIO.cleanup()
             
             print("✅ Nettoyage SX1262 terminé")
             
@@ -236,6 +287,42 @@ class SX1262Controller:
             print(f"⚠️ Erreur nettoyage: {e}")
 
 
+class SX1262Simulation(_SX1262Base):
+    """SX1262 simulé lorsque les modules SPI/GPIO sont absents (PC)."""
+    
+    def __init__(self):
+        super().__init__()
+        print("⚠️ Mode simulation - pas de communication SPI réelle")
+    
+    def reset_sx1262(self):
+        """Reset du SX1262."""
+        print("🔄 [SIMULATION] Reset SX1262")
+        time.sleep(0.1)
+    
+    def wait_while_busy(self, timeout: float = 0.1):
+        """Pas de ligne BUSY en simulation."""
+    
+    def send_command(self, command: int, params=None) -> list:
+        """Envoie une commande au SX1262."""
+        print(f"📡 [SIMULATION] Commande SX1262: 0x{command:02X}")
+        return [0x00] * (len(params) if params else 1)
+    
+    def _transmit(self, payload: bytes, timeout: float) -> bool:
+        """Simule l'émission d'un payload."""
+        print(f"📡 [SIMULATION] Transmission: {payload.hex().upper()} ({len(payload)} octets)")
+        time.sleep(0.5)  # Simule le temps de transmission
+        return True
+    
+    def cleanup(self):
+        """Nettoyage des ressources."""
+        print("✅ Nettoyage SX1262 terminé")
+
+
+def SX1262Controller() -> _SX1262Base:
+    """Retourne le contrôleur SX1262 réel si SPI/GPIO sont disponibles, simulé sinon."""
+    return SX1262Hardware() if SPI_AVAILABLE else SX1262Simulation()
+
+
 class RPiMainController:
     """Contrôleur principal pour Raspberry Pi avec transmission LoRa."""
     
@@ -277,50 +364,51 @@ class RPiMainController:
                 print("⚠️ Aucun payload à transmettre")
                 return False
             
-            print(f"📡 Début transmission de {len(self.main_controller.final_results)} payloads")
+            # Champs utiles à l'émission extraits une fois pour toutes : (groupe, nombre d'EPCs, payload, durée ms).
+            # Le payload est déjà sous forme d'octets : pas de décodage hex dans la boucle d'émission
+            frames = [(result['Group_ID'], result['Suffix_Count'], result['Payload'], result['T_frame_ms'])
+                      for result in self.main_controller.final_results]
+            frame_count = len(frames)
+            
+            print(f"📡 Début transmission de {frame_count} payloads")
             print(f"⏱️ Délai entre trames: {delay_between_frames:.1f}s")
             
             self.transmission_active = True
             transmitted_count = 0
             failed_count = 0
             
-            for i, result in enumerate(self.main_controller.final_results):
+            for i, (group_id, suffix_count, payload, frame_ms) in enumerate(frames):
                 if self.stop_event.is_set():
                     print("\n⚠️ Transmission interrompue")
                     break
                 
-                print(f"\n📤 Transmission {i+1}/{len(self.main_controller.final_results)}")
-                print(f"   Groupe {result['Group_ID']}: {result['Suffix_Count']} EPCs")
-                
-                # Reconstruction du payload
-                payload = bytes.fromhex(result['Payload_Hex'])
+                # En-tête de trame en une seule écriture, affiché avant l'émission (qui peut durer plusieurs secondes)
+                print(f"\n📤 Transmission {i+1}/{frame_count}\n   Groupe {group_id}: {suffix_count} EPCs")
                 
                 # Transmission
-                success = self.sx1262.transmit_payload(payload)
+                # Délai d'attente de fin d'émission : deux fois la durée théorique de la trame
+                success = self.sx1262.transmit_payload(payload, timeout=2 * frame_ms / 1000 + 0.1)
                 
                 if success:
                     transmitted_count += 1
-                    print(f"   ✅ Transmis ({result['T_frame_ms']:.2f}ms théorique)")
+                    print(f"   ✅ Transmis ({frame_ms:.2f}ms théorique)")
                 else:
                     failed_count += 1
                     print(f"   ❌ Échec transmission")
                 
-                # Délai entre les transmissions
-                if i < len(self.main_controller.final_results) - 1:
-                    for remaining in range(int(delay_between_frames * 10), 0, -1):
-                        if self.stop_event.is_set():
-                            break
-                        if remaining % 10 == 0:
-                            print(f"   ⏳ Attente {remaining//10}s...", end='\r')
-                        time.sleep(0.1)
-                    print(" " * 20, end='\r')  # Efface le compteur
+                # Délai entre les transmissions (annoncé une seule fois en début de transmission) :
+                # une seule attente, interrompue dès le signal d'arrêt
+                if i < frame_count - 1:
+                    if self.stop_event.wait(delay_between_frames):
+                        print("\n⚠️ Transmission interrompue")
+                        break
             
             self.transmission_active = False
             
             print(f"\n📊 Résumé transmission:")
             print(f"   • Réussies: {transmitted_count}")
             print(f"   • Échecs: {failed_count}")
-            print(f"   • Total: {len(self.main_controller.final_results)}")
+            print(f"   • Total: {frame_count}")
             
             return transmitted_count > 0
             
@@ -377,13 +465,18 @@ class RPiMainController:
         self.sx1262.cleanup()
 
 
+@lru_cache(maxsize=1)
 def check_raspberry_pi():
-    """Vérifie si on est sur un Raspberry Pi."""
+    """Vérifie si on est sur un Raspberry Pi (lu une seule fois, le modèle ne change pas)."""
+    # Lecture brute du descripteur (quelques dizaines d'octets), sans objet fichier texte
     try:
-        with open('/proc/device-tree/model', 'r') as f:
-            model = f.read()
-            return 'Raspberry Pi' in model
-    except:
+        fd = os.open('/proc/device-tree/model', os.O_RDONLY)
+        try:
+            model = os.read(fd, 64)
+        finally:
+            os.close(fd)
+        return b'Raspberry Pi' in model
+    except OSError:
         return False
 
 
@@ -7,19 +7,18 @@ Complete RFID EPC processing via LoRaWAN without real transmission.
 import os
 import sys
 import traceback
+import importlib.util
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
 
 def check_dependencies():
     """Check if all required dependencies are installed."""
     required_packages = ['pandas', 'openpyxl']
     missing_packages = []
     
+    # Locate the packages without importing them: they are loaded only when actually used
     for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
+        if importlib.util.find_spec(package) is None:
             missing_packages.append(package)
     
     if missing_packages:
@@ -72,6 +71,8 @@ def create_sample_epcs_file():
             "123456789ABCDEF123456789"
         ]
         
+        import pandas as pd
+        
         # Create DataFrame with simple column name
         df = pd.DataFrame(sample_epcs, columns=['EPC'])
         
@@ -144,14 +145,16 @@ def display_results_summary(controller):
     print("RESULTS SUMMARY")
     print("=" * 80)
     
-    total_epcs = sum(result.get('Suffix_Count', 0) for result in controller.final_results)
-    total_payload_bytes = sum(result.get('Payload_Bytes', 0) for result in controller.final_results)
-    total_frame_time = sum(result.get('T_frame_ms', 0) for result in controller.final_results)
-    
-    if len(controller.final_results) > 0:
-        avg_frame_time = total_frame_time / len(controller.final_results)
-    else:
-        avg_frame_time = 0
+    # Totals already accumulated by the controller while saving; otherwise a single pass over the results
+    totals = getattr(controller, 'final_totals', None)
+    if totals is None:
+        totals = [len(controller.final_results), 0, 0, 0.0]
+        for result in controller.final_results:
+            totals[1] += result.get('Suffix_Count', 0)
+            totals[2] += result.get('Payload_Bytes', 0)
+            totals[3] += result.get('T_frame_ms', 0)
+    group_count, total_epcs, total_payload_bytes, total_frame_time = totals
+    avg_frame_time = total_frame_time / group_count
     
     print("Global Statistics:")
     print("  EPCs processed: " + str(total_epcs))
@@ -162,7 +165,8 @@ def display_results_summary(controller):
     
     print("\nDetails by group:")
     for result in controller.final_results:
-        verification = "OK" if result.get('Verification_OK', False) else "ERROR"
+        verified = result.get('Verification_OK')
+        verification = "NOT VERIFIED" if verified is None else ("OK" if verified else "ERROR")
         group_id = result.get('Group_ID', 'N/A')
         suffix_count = result.get('Suffix_Count', 0)
         payload_bytes = result.get('Payload_Bytes', 0)
@@ -232,7 +236,7 @@ def main():
         
         # Initialize controller
         print("\nInitializing controller...")
-        controller = MainController(sf=sf, bw=bw, cr=cr, log_file="test_processing.log")
+        controller = MainController(sf=sf, bw=bw, cr=cr, log_file="test_processing.log", verify=True)
         
         # Display configuration
         display_configuration(controller)
@@ -4,49 +4,225 @@
 setup_requirements.py - Setup script to install required dependencies
 """
 
-import subprocess
+import os
+import re
 import sys
-import importlib
+import importlib.util
+from importlib import metadata
+from functools import lru_cache
 
-def install_package(package):
-    """Install a package using pip."""
-    try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to install {package}: {e}")
-        return False
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def check_and_install_packages():
-    """Check and install required packages."""
-    required_packages = {
-        'pandas': 'pandas',
-        'openpyxl': 'openpyxl',
-        'xlsxwriter': 'xlsxwriter'  # Alternative Excel writer
-    }
+# Run as a zipapp (python setup.pyz): SCRIPT_DIR is then the archive itself, and files
+# written by the script go next to the archive
+ZIPAPP_PATH = SCRIPT_DIR if os.path.isfile(SCRIPT_DIR) else None
+OUTPUT_DIR = os.path.dirname(ZIPAPP_PATH) if ZIPAPP_PATH else SCRIPT_DIR
+
+# Written after a successful setup, one line per interpreter and requirements.txt content (see setup_key);
+# lets later runs skip the package scan entirely
+SENTINEL_FILE = os.path.join(OUTPUT_DIR, ".setup_ok")
+
+# Identifies the interpreter being set up: another Python (venv, upgrade) has its own site-packages
+INTERPRETER_KEY = f"{sys.executable} {sys.version.split()[0]}"
+
+# Shipped with the script (see resource_dir):
+# - requirements.txt: the required packages and their minimum versions, checked by scan_packages
+#   and installed in one pip run with -r
+# - wheels/: optional local wheel directory (pip wheel -w wheels ...); when present, installs run offline from it
+REQUIREMENTS_NAME = "requirements.txt"
+WHEELHOUSE_NAME = "wheels"
+
+# "name[extras] >=1.5, <3 ; marker" -> name and the (operator, version) pairs; extras and markers are ignored
+REQUIREMENT_RE = re.compile(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*([^;]*)")
+SPECIFIER_RE = re.compile(r"\s*(~=|==|!=|<=|>=|<|>)\s*([0-9][^\s,]*)\s*")
+
+# Not installed automatically: the code falls back to openpyxl when these are absent
+OPTIONAL_PACKAGES = {
+    'xlsxwriter': 'xlsxwriter'  # Faster streaming Excel writer
+}
+
+def pip_usable():
+    """Tell whether pip may install into this interpreter (PEP 668 "externally managed" check)."""
+    if sys.prefix != sys.base_prefix:
+        return True, "virtual environment"
+    import sysconfig
+    marker = os.path.join(sysconfig.get_path("stdlib"), "EXTERNALLY-MANAGED")
+    if os.path.exists(marker):
+        return False, f"system Python is externally managed ({marker})"
+    return True, "system Python"
+
+@lru_cache(maxsize=1)
+def resource_dir():
+    """
+    Directory holding requirements.txt and wheels/: the script's own directory, or, when running
+    from a zipapp, a temporary extraction of those files (pip cannot read inside the archive).
+    """
+    if ZIPAPP_PATH is None:
+        return SCRIPT_DIR
+    
+    import atexit
+    import shutil
+    import tempfile
+    import zipfile
+    extract_dir = tempfile.mkdtemp(prefix="rfid_setup_")
+    atexit.register(shutil.rmtree, extract_dir, True)
+    with zipfile.ZipFile(ZIPAPP_PATH) as archive:
+        members = [name for name in archive.namelist()
+                   if name == REQUIREMENTS_NAME or name.startswith(WHEELHOUSE_NAME + "/")]
+        archive.extractall(extract_dir, members)
+    return extract_dir
+
+def install_packages(packages):
+    """Install several packages with a single pip invocation."""
+    import subprocess  # Only needed when something has to be installed
     
-    print("🔍 Checking required packages...")
+    # Prefer prebuilt wheels (also reused from pip's wheel cache) over building source distributions
+    options = ["-q", "--prefer-binary", "--disable-pip-version-check", "--no-input"]
+    wheelhouse = os.path.join(resource_dir(), WHEELHOUSE_NAME)
+    if os.path.isdir(wheelhouse) and os.listdir(wheelhouse):
+        print(f"📁 Installing from local wheelhouse {wheelhouse}")
+        options += ["--no-index", f"--find-links={wheelhouse}"]
+    
+    # pip output is captured rather than streamed to the terminal, and only shown on failure
+    result = subprocess.run([sys.executable, "-m", "pip", "install", *options, *packages],
+                            capture_output=True, text=True)
+    if result.returncode:
+        print(f"❌ Failed to install {', '.join(packages)} (pip exit code {result.returncode})")
+        print(result.stdout + result.stderr)
+        return False
+    return True
+
+@lru_cache(maxsize=1)
+def read_requirements():
+    """Return the text of requirements.txt, read straight from the archive when running as a zipapp."""
+    if ZIPAPP_PATH is None:
+        with open(os.path.join(SCRIPT_DIR, REQUIREMENTS_NAME), encoding="utf-8") as f:
+            return f.read()
+    import zipfile
+    with zipfile.ZipFile(ZIPAPP_PATH) as archive:
+        return archive.read(REQUIREMENTS_NAME).decode("utf-8")
+
+def parse_requirements(text):
+    """Return (requirement line, distribution name, [(operator, version), ...]) for each requirement in text."""
+    requirements = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line or line.startswith("-"):  # Comments and pip options (-r, --index-url...)
+            continue
+        match = REQUIREMENT_RE.match(line)
+        if match is None:
+            continue
+        name, specifiers = match.groups()
+        requirements.append((line, name, [spec.groups() for spec in SPECIFIER_RE.finditer(specifiers)]))
+    return requirements
+
+def release_tuple(version):
+    """Numeric release part of a version string: '1.5.3rc1' -> (1, 5, 3)."""
+    match = re.match(r"\d+(?:\.\d+)*", version)
+    return tuple(int(part) for part in match.group().split(".")) if match else ()
+
+def version_satisfies(version, specifiers):
+    """Tell whether an installed version meets every (operator, version) pair, comparing release numbers only."""
+    have = release_tuple(version)
+    for operator, wanted in specifiers:
+        want = release_tuple(wanted)
+        if operator == "~=":
+            if have < want or have[:len(want) - 1] != want[:-1]:
+                return False
+            continue
+        # Padded to the same length so that 1.5 == 1.5.0
+        size = max(len(have), len(want))
+        a, b = have + (0,) * (size - len(have)), want + (0,) * (size - len(want))
+        if not {"==": a == b, "!=": a != b, "<=": a <= b, ">=": a >= b, "<": a < b, ">": a > b}[operator]:
+            return False
+    return True
+
+def setup_key():
+    """Sentinel line for this interpreter and the current requirements.txt: editing the file invalidates it."""
+    import hashlib
+    digest = hashlib.sha256(read_requirements().encode("utf-8")).hexdigest()[:16]
+    return f"{INTERPRETER_KEY} {digest}"
+
+def read_setup_sentinel():
+    """Return the interpreters already set up, ignoring a sentinel older than this script."""
+    try:
+        if os.stat(SENTINEL_FILE).st_mtime < os.stat(ZIPAPP_PATH or __file__).st_mtime:
+            return []
+        with open(SENTINEL_FILE, encoding="utf-8") as f:
+            return f.read().splitlines()
+    except OSError:
+        return []
+
+def scan_packages():
+    """
+    Check requirements.txt against the installed distributions.
     
-    missing_packages = []
+    Returns {'installed': [...], 'missing': [...], 'outdated': {requirement: installed version},
+    'optional_missing': [...]}; 'missing' and 'outdated' hold requirement lines as written in the file.
+    """
+    status = {'installed': [], 'missing': [], 'outdated': {}, 'optional_missing': []}
     
-    for module_name, package_name in required_packages.items():
+    # Versions come from the installed metadata (no import): loading pandas just to test for it costs hundreds of ms
+    for requirement, name, specifiers in parse_requirements(read_requirements()):
         try:
-            importlib.import_module(module_name)
-            print(f"✅ {module_name} is installed")
-        except ImportError:
-            print(f"❌ {module_name} is missing")
-            missing_packages.append(package_name)
+            version = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            status['missing'].append(requirement)
+            continue
+        if version_satisfies(version, specifiers):
+            status['installed'].append(name)
+        else:
+            status['outdated'][requirement] = version
+    
+    for module_name, package_name in OPTIONAL_PACKAGES.items():
+        if module_name in sys.modules or importlib.util.find_spec(module_name) is not None:
+            status['installed'].append(package_name)
+        else:
+            status['optional_missing'].append(package_name)
+    return status
+
+def check_and_install_packages():
+    """Check and install required packages."""
+    status = scan_packages()
+    missing_packages = status['missing'] + list(status['outdated'])
+    
+    # Whole report built first, then written at once
+    lines = ["🔍 Checking required packages..."]
+    lines += [f"✅ {package} is installed" for package in status['installed']]
+    lines += [f"❌ {package} is missing" for package in status['missing']]
+    lines += [f"❌ {package} is required, {version} is installed" for package, version in status['outdated'].items()]
+    lines += [f"ℹ️ {package} not installed (optional, for faster Excel output: pip install {package})"
+              for package in status['optional_missing']]
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
     
     if missing_packages:
         print(f"\n📦 Installing missing packages: {', '.join(missing_packages)}")
         
-        for package in missing_packages:
-            print(f"Installing {package}...")
-            if install_package(package):
-                print(f"✅ {package} installed successfully")
-            else:
-                print(f"❌ Failed to install {package}")
-                return False
+        # Fail fast instead of letting pip download metadata and then refuse to install
+        usable, reason = pip_usable()
+        if not usable:
+            print(f"❌ pip cannot install here: {reason}")
+            print("Create and activate a virtual environment, then run this script again:")
+            print(f"  {sys.executable} -m venv .venv && . .venv/bin/activate")
+            names = " ".join(f"python3-{name}" for _, name, _ in parse_requirements(read_requirements()))
+            print(f"or install the packages with your system package manager (e.g. apt install {names})")
+            return False
+        
+        # One pip run resolving the whole requirements file; wheel lets pip cache built packages as wheels
+        batch = ["-r", os.path.join(resource_dir(), REQUIREMENTS_NAME)]
+        if importlib.util.find_spec('wheel') is None:
+            batch.insert(0, 'wheel')
+        
+        # On failure, retry the missing requirements one by one to find the culprit
+        if not install_packages(batch):
+            for package in missing_packages:
+                print(f"Installing {package}...")
+                if install_packages([package]):
+                    print(f"✅ {package} installed successfully")
+                else:
+                    print(f"❌ Failed to install {package}")
+                    return False
         
         print("\n🎉 All packages installed successfully!")
     else:
@@ -56,17 +232,39 @@ def check_and_install_packages():
 
 def main():
     """Main setup function."""
+    # --json: report package status as JSON only (no installation); exit code 1 if a requirement is not met
+    if "--json" in sys.argv[1:]:
+        import json
+        status = scan_packages()
+        print(json.dumps(status))
+        return 1 if status['missing'] or status['outdated'] else 0
+    
     print("🚀 RFID LoRaWAN Processing - Setup Requirements")
     print("=" * 60)
     
+    # Fast path: setup already succeeded for this interpreter and requirements.txt since this script was last modified
+    done_interpreters = read_setup_sentinel()
+    key = setup_key()
+    if key in done_interpreters:
+        print("✅ Setup already completed (delete .setup_ok to check again)")
+        return 0
+    
     if check_and_install_packages():
+        try:
+            with open(SENTINEL_FILE, "w", encoding="utf-8") as f:
+                # Entries of this interpreter for an older requirements.txt are replaced
+                others = [line for line in done_interpreters if not line.startswith(INTERPRETER_KEY + " ")]
+                f.write("\n".join(others + [key]) + "\n")
+        except OSError as e:
+            # Read-only location (e.g. zipapp next to a protected directory): checks will simply rerun
+            print(f"⚠️ Could not write {os.path.basename(SENTINEL_FILE)}, skipping it ({e})")
         print("\n✅ Setup completed successfully!")
         print("You can now run the main test script.")
         return 0
     else:
         print("\n❌ Setup failed!")
         print("Please install the missing packages manually:")
-        print("pip install pandas openpyxl xlsxwriter")
+        print(f"pip install -r {REQUIREMENTS_NAME}")
         return 1
 
 if __name__ == "__main__":